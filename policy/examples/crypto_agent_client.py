@@ -10,61 +10,85 @@ This demonstrates how to:
 NOTE: Uses coincurve library for secp256k1 (Bitcoin curve) support.
 """
 
+import functools
+import itertools
 import os
 import uuid
-import requests
+import httpx
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple
 import hashlib
+import hmac
 
 from coincurve import PrivateKey, PublicKey
 from cryptography.hazmat.primitives.ciphers.aead import AESGCMSIV
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.hkdf import HKDF
-from cryptography.hazmat.backends import default_backend
+
+# Resolve the hash backend once at import time so the hot paths are a
+# single indirect call instead of a per-call try/except and import.
+try:
+    import blake3
+    _hasher_factory = blake3.blake3
+except ImportError:
+    # Fallback to SHA256 if blake3 not available
+    _hasher_factory = hashlib.sha256
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    # Fallback to the stdlib parser if orjson not available
+    _json_loads = json.loads
+    _json_dumps = lambda obj: json.dumps(obj).encode()
 
 
 def derive_shared_secret(
     private_key: PrivateKey,
-    public_key_bytes: bytes,
-    session_id: uuid.UUID
+    session_public_key: PublicKey,
+    session_id_bytes: bytes
 ) -> bytes:
     """Derive shared secret using ECDH and HKDF."""
-    # Perform raw ECDH using coincurve
-    from coincurve import PublicKey as CPublicKey
-    
-    session_public_key = CPublicKey(public_key_bytes)
-    # Multiply session public key by user private key scalar
+    # Multiply session public key by user private key scalar.
+    # NOTE: coincurve's PublicKey.ecdh() would be cheaper (no point
+    # re-serialization) but it returns SHA-256 of the compressed shared
+    # point, not the raw X coordinate the Rust hypervisor feeds into
+    # HKDF, so we must stay on the multiply path.
     shared_point = session_public_key.multiply(private_key.secret)
     
-    # Extract x-coordinate (first 32 bytes after the 0x04 prefix for uncompressed)
-    shared_point_uncompressed = shared_point.format(compressed=False)
-    # Uncompressed format: 0x04 + x (32 bytes) + y (32 bytes)
-    shared_key = shared_point_uncompressed[1:33]  # Extract x-coordinate
-    
-    # Use HKDF to derive encryption key (matching Rust implementation)
-    hkdf = HKDF(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=session_id.bytes,
-        info=b'',
-        backend=default_backend()
-    )
-    
-    derived_key = hkdf.derive(shared_key)
-    return derived_key
+    # Extract x-coordinate from the compressed serialization: 1-byte
+    # parity prefix + x (32 bytes). Same 32 bytes as slicing the
+    # uncompressed form, without serializing the 32-byte y-coordinate.
+    # The memoryview slice hands hmac a zero-copy window instead of
+    # allocating an intermediate bytes object.
+    shared_key = memoryview(shared_point.format(compressed=True))[1:]
+
+    # HKDF-SHA256 with empty info and a single 32-byte output block
+    # reduces to two one-shot HMACs (extract, then T(1) = HMAC(prk,
+    # info || 0x01)); hmac.digest uses OpenSSL's one-shot C path and
+    # yields the same key as the Rust implementation's HKDF.
+    prk = hmac.digest(session_id_bytes, shared_key, "sha256")
+    return hmac.digest(prk, b"\x01", "sha256")
 
 
 def derive_nonce(data: bytes) -> bytes:
-    """Derive a 12-byte nonce using BLAKE3 (or SHA256 fallback)."""
-    try:
-        import blake3
-        hash_result = blake3.blake3(data).digest()
-    except ImportError:
-        # Fallback to SHA256 if blake3 not available
-        hash_result = hashlib.sha256(data).digest()
-    
-    return hash_result[:12]
+    """Derive a 12-byte nonce using BLAKE3 (or SHA256 fallback).
+
+    Must match the Rust implementation's derive_msg_nonce().
+    """
+    return _hasher_factory(data).digest()[:12]
+
+
+@functools.lru_cache(maxsize=1024)
+def _enc(s: str) -> bytes:
+    """Encode a string, caching the result for repeated fields."""
+    return s.encode()
+
+
+@functools.lru_cache(maxsize=1024)
+def _uuid_bytes(s: str) -> bytes:
+    """Parse a UUID string to its 16 raw bytes, caching repeats."""
+    return uuid.UUID(s).bytes
 
 
 def hash_execution(execution: dict) -> str:
@@ -72,43 +96,34 @@ def hash_execution(execution: dict) -> str:
     Hash an agent execution to verify integrity.
     Must match the Rust implementation in hash_execution().
     """
-    try:
-        import blake3
-        hasher = blake3.blake3()
-    except ImportError:
-        # Fallback to SHA256 if blake3 not available
-        import hashlib
-        hasher = hashlib.sha256()
-    
-    # Hash session ID
-    session_id = uuid.UUID(execution["session_id"])
-    hasher.update(session_id.bytes)
-    
-    # Hash plan
+    hasher = _hasher_factory()
+
+    # Concatenate all fields into a single buffer and hash it in one
+    # update() call: this amortizes the per-call FFI overhead and lets
+    # BLAKE3 compress full chunks on its SIMD path. The per-record
+    # sub-lists are flattened with chain.from_iterable and joined so the
+    # inner loops stay in C. Field order must match the Rust
+    # implementation exactly.
     plan = execution["plan"]
-    hasher.update(plan["system_prompt"].encode())
-    hasher.update(plan["user_query"].encode())
-    
-    for step in plan["thought_process"]:
-        hasher.update(step["content"].encode())
-    
-    # Hash tool calls
-    for call in execution["tool_calls"]:
-        call_id = uuid.UUID(call["id"])
-        hasher.update(call_id.bytes)
-        hasher.update(call["tool_name"].encode())
-        hasher.update(call["arguments"].encode())
-    
-    # Hash tool results
-    for result in execution["tool_results"]:
-        call_id = uuid.UUID(result["call_id"])
-        hasher.update(call_id.bytes)
-        hasher.update(bytes([1 if result["success"] else 0]))
-        hasher.update(result["result"].encode())
-    
-    # Hash final response
-    hasher.update(execution["final_response"].encode())
-    
+    parts = [
+        _uuid_bytes(execution["session_id"]),
+        _enc(plan["system_prompt"]),
+        _enc(plan["user_query"]),
+    ]
+    parts.extend(_enc(step["content"]) for step in plan["thought_process"])
+    parts.extend(itertools.chain.from_iterable(
+        (_uuid_bytes(call["id"]), _enc(call["tool_name"]), _enc(call["arguments"]))
+        for call in execution["tool_calls"]
+    ))
+    parts.extend(itertools.chain.from_iterable(
+        (_uuid_bytes(result["call_id"]),
+         b"\x01" if result["success"] else b"\x00",
+         _enc(result["result"]))
+        for result in execution["tool_results"]
+    ))
+    parts.append(_enc(execution["final_response"]))
+
+    hasher.update(b"".join(parts))
     return hasher.hexdigest()
 
 
@@ -152,34 +167,39 @@ def print_execution_details(execution: dict, indent: int = 2):
 
 
 def create_session_keypair(
-    base_url: str, 
-    user_public_key: str, 
-    verifiable: bool = False
+    base_url: str,
+    user_public_key: str,
+    verifiable: bool = False,
+    http: httpx.Client = None
 ) -> Tuple[str, str, str]:
     """
     Create a session keypair with the hypervisor.
-    
+
     Args:
         base_url: Hypervisor base URL
         user_public_key: User's hex-encoded public key
         verifiable: If True, use /verifiable/encrypt/create_keypair to get attestation
-        
+        http: Optional httpx.Client to reuse a pooled connection
+
     Returns:
         Tuple of (session_pubkey, session_id, quote)
         Note: quote will be empty string if verifiable=False
     """
     endpoint = "/verifiable/encrypt/create_keypair" if verifiable else "/encrypt/create_keypair"
-    response = requests.post(
+    response = (http or httpx).post(
         f"{base_url}{endpoint}",
         json={"pubkey": user_public_key}
     )
     
-    if not response.ok:
-        try:
-            error_data = response.json()
-            error_msg = error_data.get("msg", response.text)
-        except:
-            error_msg = response.text
+    if not response.is_success:
+        error_msg = response.text
+        # Only attempt a JSON parse when the server says it sent JSON;
+        # plain-text error bodies skip the parse entirely
+        if response.headers.get("content-type", "").startswith("application/json"):
+            try:
+                error_msg = response.json().get("msg", response.text)
+            except ValueError:
+                pass
         raise Exception(f"HTTP {response.status_code}: {error_msg}")
     
     data = response.json()
@@ -192,27 +212,48 @@ class CryptoAgentClient:
         self.base_url = base_url
         self.private_key = PrivateKey()
         self.public_key_bytes = self.private_key.public_key.format(compressed=True)
+        self.public_key_hex = self.public_key_bytes.hex()
         self.session_pk = None
         self.session_id = None
+        self.session_id_bytes = None
         self.cipher = None
+
+        # Reuse keep-alive connections instead of a fresh TCP+TLS
+        # handshake per request. HTTP/2 (requires the httpx[h2] extra)
+        # is negotiated via TLS ALPN, so it only kicks in on https
+        # deployments; the cleartext localhost default stays on HTTP/1.1
+        # keep-alive with one pooled connection per concurrent query.
+        self._http = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=2,
+                limits=httpx.Limits(
+                    max_keepalive_connections=8,
+                    keepalive_expiry=30.0
+                )
+            ),
+            timeout=httpx.Timeout(30.0, connect=3.0)
+        )
         
     def create_session(self, verifiable=False):
         """Create a new session with the hypervisor"""
-        user_pk_hex = self.public_key_bytes.hex()
-        
         session_pk_hex, session_id_str, session_quote = create_session_keypair(
-            self.base_url, user_pk_hex, verifiable=verifiable
+            self.base_url, self.public_key_hex, verifiable=verifiable, http=self._http
         )
         
-        self.session_id = uuid.UUID(session_id_str)
+        # Keep the session id as a string plus its raw bytes: the UUID
+        # object was only ever round-tripped back through .bytes
+        self.session_id = session_id_str
+        self.session_id_bytes = uuid.UUID(session_id_str).bytes
         self.session_pk = session_pk_hex
-        
-        # Derive shared encryption key
-        session_pk_bytes = bytes.fromhex(session_pk_hex)
+
+        # Derive shared encryption key; parse (and point-validate) the
+        # session public key exactly once
+        session_public_key = PublicKey(bytes.fromhex(session_pk_hex))
         encryption_key = derive_shared_secret(
-            self.private_key, 
-            session_pk_bytes, 
-            self.session_id
+            self.private_key,
+            session_public_key,
+            self.session_id_bytes
         )
         
         self.cipher = AESGCMSIV(encryption_key)
@@ -223,30 +264,49 @@ class CryptoAgentClient:
         
         return self.session_id, session_quote
     
-    def query_agent(self, query, verifiable=False):
-        """Query the crypto agent"""
+    def query_agent(self, query, verifiable=False, verify=True, verbose=False):
+        """
+        Query the crypto agent.
+
+        Args:
+            query: Plaintext query to encrypt and send
+            verifiable: If True, use the attested endpoint and return
+                quote/compliance data
+            verify: If True, recompute the execution hash client-side
+                and report it in the result; throughput-oriented callers
+                can disable it and trust the server's hash
+            verbose: If True, print the full execution details
+        """
         if not self.cipher:
             raise Exception("No session created. Call create_session() first.")
         
-        # Encrypt the query
-        nonce = derive_nonce(self.session_id.bytes)
+        # Encrypt the query. The hypervisor decrypts with its own
+        # derive_msg_nonce(session_id), so the nonce must be derived the
+        # same way here; the per-session reuse this implies is what
+        # AES-GCM-SIV's nonce-misuse resistance covers.
+        nonce = derive_nonce(self.session_id_bytes)
         encrypted_query = self.cipher.encrypt(nonce, query.encode(), None)
         
         endpoint = "/verifiable/agent/query" if verifiable else "/agent/query"
         url = f"{self.base_url}{endpoint}"
-        
-        user_pk_hex = self.public_key_bytes.hex()
-        
-        response = requests.post(url, json={
+
+        # Serialize the body with orjson (bytes out, no separate encode
+        # step) instead of letting the client run json.dumps internally
+        body = _json_dumps({
             "encrypted_query": encrypted_query.hex(),
-            "public_key": user_pk_hex,
+            "public_key": self.public_key_hex,
             "use_llm_compliance": True
         })
+        response = self._http.post(
+            url, content=body, headers={"Content-Type": "application/json"}
+        )
         
         if response.status_code != 200:
             raise Exception(f"Query failed: {response.text}")
-        
-        data = response.json()
+
+        # orjson parses the large nested execution dict 2-5x faster
+        # than response.json()
+        data = _json_loads(response.content)
         
         # Decrypt the response
         response_nonce = bytes.fromhex(data["response_nonce"])
@@ -263,7 +323,15 @@ class CryptoAgentClient:
         if verifiable:
             result["quote"] = data["quote"]
             result["compliance"] = data["compliance"]
-        
+
+        if verify:
+            computed_hash = hash_execution(data["execution"])
+            result["computed_hash"] = computed_hash
+            result["hash_verified"] = computed_hash == data["execution_hash"]
+
+        if verbose:
+            print_execution_details(data["execution"])
+
         return result
 
 
@@ -276,7 +344,7 @@ def main():
         # Create verifiable session
         print("\nCreating verifiable session...")
         client = CryptoAgentClient()
-        print(f"User Public Key: {client.public_key_bytes.hex()}")
+        print(f"User Public Key: {client.public_key_hex}")
         
         session_id, session_quote = client.create_session(verifiable=True)
         
@@ -289,12 +357,20 @@ def main():
             "Tell me whether I should buy some Bitcoin",  # Non-compliant: Investment advice violates policy
         ]
         
-        for i, query in enumerate(queries, 1):
+        # Queries are independent once the session exists, so dispatch
+        # them concurrently and overlap network + server-side LLM latency
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            futures = [
+                pool.submit(client.query_agent, query, verifiable=True)
+                for query in queries
+            ]
+
+        for i, (query, future) in enumerate(zip(queries, futures), 1):
             print(f"\n{i}. Query: {query}")
             print("-" * 60)
-            
+
             try:
-                result = client.query_agent(query, verifiable=True)
+                result = future.result()
                 print(f"Response: {result['response']}")
                 print(f"Execution time: {result['execution_time_ms']}ms")
                 print(f"Execution hash: {result['execution_hash']}")
@@ -306,16 +382,14 @@ def main():
                 print(f"\nExecution Details:")
                 print_execution_details(result['execution'])
                 
-                # Verify hash
+                # Verify hash (computed in the worker by query_agent)
                 print(f"\nHash Verification:")
-                computed_hash = hash_execution(result['execution'])
-                matches = computed_hash == result['execution_hash']
-                status = "✓ VERIFIED" if matches else "✗ MISMATCH"
+                status = "✓ VERIFIED" if result['hash_verified'] else "✗ MISMATCH"
                 print(f"  Server hash:   {result['execution_hash']}")
-                print(f"  Computed hash: {computed_hash}")
+                print(f"  Computed hash: {result['computed_hash']}")
                 print(f"  Status: {status}")
-                
-                if not matches:
+
+                if not result['hash_verified']:
                     print(f"  WARNING: Hash mismatch indicates execution was tampered with!")
                 
             except Exception as e:
@@ -339,7 +413,7 @@ def main():
 if __name__ == "__main__":
     try:
         main()
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         print("\nError: Could not connect to hypervisor. Make sure it's running.")
         print("Start it with: cargo run --bin hypervisor")
     except Exception as e: